@@ -16,7 +16,12 @@ VERSION = '0.3.0'
 import os
 import sys
 import re
+import shlex
 import argparse
+import bisect
+import sqlite3
+import heapq
+import itertools
 import pyexiv2
 import datetime
 import timeparse
@@ -55,6 +60,31 @@ optional arguments:
                             fields. If there is no headline use --Format to
                             specify its format.
   -i, --index [FILE]        Use FILE as index instead of checking jpegs.
+                            Use this option multiple times to merge several
+                            index-files. Each of them must be sorted by datetime
+                            (resp. by TAG of --sort), then the merged images are
+                            sorted as well without loading them into memory.
+  -I, --database FILE       Use the sqlite-database FILE as index. The selection
+                            and sorting is done by sqlite, except for
+                            --first-after and durations of --times, which are
+                            checked while reading the rows in order of their
+                            datetime and can't be combined with another --sort.
+                            The tests of --queries are checked while reading the
+                            rows as well, which are then in order of their
+                            datetime if a query uses --dates, --datetime or a
+                            duration of --times.
+  -W, --write-database FILE Write the selected images into the sqlite-database
+                            FILE instead of printing them. With --limit only the
+                            first N images are written.
+  -o, --output FILE         Write the output to FILE instead of stdout.
+  -q, --queries FILE        Run each line of FILE as a query of its own, while
+                            the images are read only once. A line takes the
+                            arguments for image-selection and aggregation as
+                            well as --limit, --headline and --output (e.g.
+                            -m "Canon EOS 5D" -d 9.7.2013 -o canon.txt).
+                            Lines starting with # are ignored.
+                            Arguments for image-selection given next to --queries
+                            select the images for all queries.
   -H, --headline            Print the output's format as first line.
   -s, --sort TAG            Sort all images after TAG.
                             The default order is alphanumerical in regard of the
@@ -62,6 +92,11 @@ optional arguments:
                             Mind that sorting is memory-expensive, because the
                             data of all jpegs (resp. of the index-file) will be
                             loaded into memory. Only use it if needed.
+  -l, --limit N             Print at most N images. Reading the images stops as
+                            soon as N of them have been printed. Together with
+                            --sort only the first N matching images are held in
+                            memory, unless --dates, --datetime or a --times
+                            duration is used, which need all images sorted.
 
 TAG could be path, name, date, time, datetime, exposure_time or model.
 FORMAT is an arbitrary sequence of these words (e.g. -f "path - date - time")
@@ -90,6 +125,23 @@ arguments for image-selection:
                             image should be in.
                             Mind that this only gives useful results if the
                             the images are sorted by datetime.
+
+
+arguments for aggregation:
+  -g, --group-by TAG[,TAG]  Group the selected images by TAG and print one line
+                            of statistics per group instead of the images.
+  -c, --count               Print the number of images per group.
+      --min                 Print the earliest datetime per group.
+      --max                 Print the latest datetime per group.
+  -b, --buckets SEC [SEC..] Group the images into exposure-time buckets bounded
+                            by SEC (e.g. -b 1/1000 1/250 1/60).
+                            Any of these options switches to aggregation. If no
+                            statistic is specified --count is used. The
+                            statistics are computed while reading the images, so
+                            no image needs to be held in memory.
+                            The fields of a line are separated by a blank. Mind
+                            that values like models may contain blanks as well,
+                            so rather group by such a tag as the last one.
 """
 
 
@@ -211,8 +263,8 @@ class Image(dict):
         else: cls._lineformat = '{path} {date} {time} {exposure_time}'
         return cls._lineformat
 
-    def fprint(self):
-        print self.lineformat.format(**self)
+    def fprint(self, file=None):
+        print >>file or sys.stdout, self.lineformat.format(**self)
 
 
 class Index(object):
@@ -223,14 +275,16 @@ class Index(object):
 
     @classmethod
     def setformat(cls, rawf):
+        cls.format, cls.fmtlist, cls.sep = cls.parseformat(rawf)
+
+    @staticmethod
+    def parseformat(rawf):
         match = re.search('\W+', rawf)
-        cls.sep = match.group() if match else ' '
+        sep = match.group() if match else ' '
         fmt = re.findall('\w+', rawf)
         if not all([f in Image.ATTR for f in fmt]):
             raise ConfigurationError('{0} is not a valid format'.format(rawf))
-        else:
-            cls.format = rawf
-            cls.fmtlist = fmt
+        return rawf, fmt, sep
 
     def __init__(self, string):
         if string == '-': self._file = sys.stdin
@@ -239,8 +293,11 @@ class Index(object):
 
     def check_first_line(self):
         firstline = self.file.readline().rstrip('\n')
-        try: self.setformat(firstline)
+        try: self.format, self.fmtlist, self.sep = self.parseformat(firstline)
         except ConfigurationError: self._firstline = firstline
+        #the first headline serves as default for index-files without one
+        else:
+            if not Index.format: self.setformat(firstline)
 
     @property
     def file(self):
@@ -255,6 +312,117 @@ class Index(object):
             yield dict(zip(self.fmtlist, line.rstrip('\n').split(self.sep)))
 
 
+class Database(object):
+    COLUMNS = 'path, name, datetime, date, time, exposure_num, exposure_den, model'
+    ORDER = {
+        'exposure_time' : 'CAST(exposure_num AS REAL) / exposure_den',
+        }
+
+    def __init__(self, string, create=True):
+        self.name = string
+        self.connection = sqlite3.connect(string)
+        self.connection.text_factory = str
+        if create: self.create()
+        else: self.check()
+
+    @classmethod
+    def read(cls, string):
+        #don't let sqlite create a new database for a mistyped name
+        if not os.path.isfile(string):
+            raise ConfigurationError('{0} is not a database'.format(string))
+        return cls(string, create=False)
+
+    def check(self):
+        try: self.connection.execute('SELECT {0} FROM images LIMIT 0'.format(self.COLUMNS))
+        except sqlite3.DatabaseError:
+            raise ConfigurationError('{0} is not a database'.format(self.name))
+
+    def create(self):
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                name TEXT,
+                datetime TEXT,
+                date TEXT,
+                time TEXT,
+                exposure_num INTEGER,
+                exposure_den INTEGER,
+                model TEXT
+                );
+            CREATE INDEX IF NOT EXISTS images_datetime ON images (datetime);
+            CREATE INDEX IF NOT EXISTS images_date ON images (date);
+            CREATE INDEX IF NOT EXISTS images_model ON images (model);
+            """)
+
+    def insert(self, img):
+        #dates and times are stored iso-formatted to be comparable in sql
+        value = lambda k: str(img[k].value) if img[k] else None
+        exti = img['exposure_time'].value if img['exposure_time'] else None
+        self.connection.execute(
+            'INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+                img['path'].rvalue,
+                img['name'].rvalue,
+                value('datetime'),
+                value('date'),
+                value('time'),
+                exti.numerator if exti is not None else None,
+                exti.denominator if exti is not None else None,
+                img['model'].rvalue,
+                ))
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def select(self, tests, sort=None, limit=None, stateful=False):
+        if sort and sort not in Image.ATTR:
+            raise ConfigurationError('{0} is not a valid tag'.format(sort))
+        where, params = tests.pushdown()
+        #the remaining tests (resp. those of the queries) rely on rows in
+        #order of their datetime
+        stateful = stateful or tests.stateful
+        if stateful and sort not in (None, 'datetime'):
+            raise ConfigurationError('--sort {0} conflicts with --dates, '
+                '--first-after and durations of --times'.format(sort))
+        attr = 'datetime' if stateful else sort or 'path'
+        sql = 'SELECT {0} FROM images'.format(self.COLUMNS)
+        if where: sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY {0}, path'.format(self.ORDER.get(attr, attr))
+        #the limit can only be applied by sqlite if no test is left
+        if limit and not tests.tests:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self.rows(self.connection.execute(sql, params))
+
+    def rows(self, cursor):
+        for path, name, dt, date, time, num, den, model in cursor:
+            yield dict(
+                path=path,
+                name=name,
+                datetime=dt,
+                date=date,
+                time=time,
+                exposure_time=str(Fraction(num, den)) if den else None,
+                model=model,
+                )
+
+
+def posint(string):
+    try: n = int(string)
+    except ValueError: n = 0
+    if n < 1: raise ConfigurationError('{0} is not a positive integer'.format(string))
+    return n
+
+
+def taglist(string):
+    tags = string.split(',')
+    if not all([t in Image.ATTR for t in tags]):
+        raise ConfigurationError('{0} is not a valid list of tags'.format(string))
+    return tags
+
+
 class Tests(object):
     def __init__(self, args):
         self.model = args.model
@@ -267,6 +435,9 @@ class Tests(object):
         if self.datetimes: self.datetimes.sort()
         self.first_after = args.first_after
         self.period = args.hours
+        #these tests rely on the images being in order of their datetime
+        self.stateful = bool(self.dates or self.datetimes
+            or self.times and (self.first_after or self.period))
         self._tests = list()
 
     def __call__(self, img):
@@ -299,6 +470,47 @@ class Tests(object):
         return self._tests
 
 
+    def pushdown(self):
+        #translate the tests into sql-conditions and drop them from self.tests.
+        #--first-after and durations of --times rely on the order of the rows,
+        #so they stay here.
+        where, params = list(), list()
+        if self.model:
+            where.append('model = ?')
+            params.append(self.model)
+            self.model = None
+        if self.exposure_time:
+            exti = self.exposure_time
+            if len(exti) == 1:
+                where.append('exposure_num * ? = ? * exposure_den')
+                params += [exti[0].denominator, exti[0].numerator]
+            else:
+                where.append('? * exposure_den <= exposure_num * ?')
+                where.append('exposure_num * ? < ? * exposure_den')
+                params += [exti[0].numerator, exti[0].denominator]
+                params += [exti[1].denominator, exti[1].numerator]
+            self.exposure_time = None
+        if self.dates:
+            where.append('date IN ({0})'.format(', '.join('?' * len(self.dates))))
+            params += [str(d) for d in self.dates]
+            self.dates = None
+        if self.datetimes and not self.first_after:
+            if self.period:
+                cond = ' OR '.join(['datetime >= ? AND datetime < ?'] * len(self.datetimes))
+                where.append('({0})'.format(cond))
+                for dt in self.datetimes: params += [str(dt), str(dt + self.period)]
+            else:
+                where.append('datetime IN ({0})'.format(', '.join('?' * len(self.datetimes))))
+                params += [str(dt) for dt in self.datetimes]
+            self.datetimes = None
+        if self.times and not (self.first_after or self.period):
+            where.append('time IN ({0})'.format(', '.join('?' * len(self.times))))
+            params += [str(t) for t in self.times]
+            self.times = None
+        self.stateful = bool(self.datetimes or self.times and (self.first_after or self.period))
+        self._tests = list()
+        return where, params
+
     def check_model(self, img):
         if not img['model']: return False
         return self.model == img['model'].rvalue
@@ -389,35 +601,182 @@ class Tests(object):
         return any([t == img['time'].value for t in self.times])
 
 
+class Aggregation(object):
+    def __init__(self, args):
+        self.tags = args.group_by or list()
+        self.buckets = sorted(args.buckets) if args.buckets else None
+        self.count = args.count
+        self.min = args.min
+        self.max = args.max
+        self.active = bool(self.tags or self.buckets or self.count or self.min or self.max)
+        if not (self.count or self.min or self.max): self.count = True
+        self.groups = dict()
+
+    def __call__(self, img):
+        key = self.key(img)
+        if key not in self.groups: self.groups[key] = [0, None, None]
+        group = self.groups[key]
+        group[0] += 1
+        #don't parse the datetime if it isn't needed
+        if not (self.min or self.max) or not img['datetime']: return
+        dt = img['datetime'].value
+        if group[1] is None or dt < group[1]: group[1] = dt
+        if group[2] is None or dt > group[2]: group[2] = dt
+
+    def __nonzero__(self):
+        return self.active
+
+    def key(self, img):
+        key = tuple([str(img[t]) for t in self.tags])
+        if self.buckets: key += (self.bucket(img),)
+        return key
+
+    def bucket(self, img):
+        #the bucket's index keeps the groups in order of their exposure-time
+        if not img['exposure_time']: return None
+        return bisect.bisect_right(self.buckets, img['exposure_time'].value)
+
+    def label(self, i):
+        if i is None: return 'None'
+        lower = self.buckets[i-1] if i else 0
+        upper = self.buckets[i] if i < len(self.buckets) else str()
+        return '{0}-{1}'.format(lower, upper)
+
+    @property
+    def headline(self):
+        fields = list(self.tags)
+        if self.buckets: fields.append('exposure_time')
+        if self.count: fields.append('count')
+        if self.min: fields.append('min')
+        if self.max: fields.append('max')
+        return ' '.join(fields)
+
+    @property
+    def lines(self):
+        for key in sorted(self.groups):
+            count, first, last = self.groups[key]
+            fields = list(key)
+            if self.buckets: fields[-1] = self.label(fields[-1])
+            if self.count: fields.append(str(count))
+            if self.min: fields.append(str(first))
+            if self.max: fields.append(str(last))
+            yield ' '.join(fields)
+
+
+class Query(object):
+    def __init__(self, args):
+        self.args = args
+        self.tests = Tests(args)
+        self.aggregation = Aggregation(args)
+        self.printed = 0
+        self.done = False
+
+    @property
+    def file(self):
+        return self.args.output or sys.stdout
+
+    def __call__(self, img):
+        try:
+            if not self.tests(img): return
+            if self.aggregation: return self.aggregation(img)
+            img.fprint(self.file)
+            self.printed += 1
+            if self.printed == self.args.limit: raise PrintStop
+        except PrintStop: self.done = True
+
+    def printheadline(self):
+        if not self.args.headline or self.aggregation: return
+        print >>self.file, Image.lineformat.translate(None, '{}')
+
+    def printstats(self):
+        if not self.aggregation: return
+        if self.args.headline: print >>self.file, self.aggregation.headline
+        for line in self.aggregation.lines: print >>self.file, line
+
+
+OUTPUTS = dict()
+
+def output(string):
+    #queries writing to the same file share its handle
+    if string not in OUTPUTS: OUTPUTS[string] = open(string, 'w')
+    return OUTPUTS[string]
+
+
+def queries(string):
+    li = list()
+    with open(string, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            li.append(Query(queryparser.parse_args(shlex.split(line))))
+    return li
+
+
 #TODO: action-option to cp, rm or mv the files
 class Jexifs(object):
     def __init__(self, args):
         self.args = args
         self.tests = Tests(args)
-        self._paths = list()
+        self.aggregation = Aggregation(args)
         self._images = None
 
     def run(self):
         if self.args.help: print HELP
         elif self.args.version: print VERSION
+        elif self.args.write_database: self.writedatabase()
+        elif self.args.queries: self.printqueries()
+        elif self.aggregation: self.printstats()
         else: self.printlines()
 
     @property
     def images(self):
         if self._images: return self._images
-        #make a list from the generator if imgs need to be sorted
-        li_or_gen = lambda g: [i for i in g] if self.args.sort else g
+        if self.args.database: images = self._fromdatabase
+        elif self.args.index: images = self._fromindex
+        elif self.args.pathext: images = self._frompaths
+
+        #databases and merged index-files are already sorted...
+        if self.args.database: self._images = images
+        elif self.args.index and len(self.args.index) > 1: self._images = images
+        #keep only the first matches on a bounded heap if possible...
+        elif self.args.sort and self.limit and not self.tests.stateful:
+            matches = itertools.ifilter(self.tests, images)
+            self._images = heapq.nsmallest(self.limit, matches, key=self.sortkey)
+        elif self.args.sort: self._images = sorted(images, key=self.sortkey)
+        else: self._images = images
+        return self._images
 
-        if self.args.index: self._images = li_or_gen(self._fromindex)
-        elif self.args.pathext: self._images = li_or_gen(self._frompaths)
+    @property
+    def limit(self):
+        #only printing or writing the images stops at --limit
+        if self.aggregation or self.args.queries: return None
+        return self.args.limit
 
-        if self.args.sort: self.sort(self.args.sort)
-        return self._images
+    @property
+    def _fromdatabase(self):
+        queries = self.args.queries or list()
+        stateful = any([query.tests.stateful for query in queries])
+        rows = self.args.database.select(self.tests, self.args.sort, self.limit, stateful)
+        return itertools.imap(Image, rows)
 
     @property
     def _fromindex(self):
-        for data in self.args.index.lines:
-            yield Image(data)
+        if len(self.args.index) > 1:
+            for img in self._merge(self.args.index): yield img
+        else:
+            for data in self.args.index[0].lines:
+                yield Image(data)
+
+    def _merge(self, indexes):
+        #merge the sorted index-files lazily on a heap
+        key = self.sortkey
+        def decorate(n, index):
+            for data in index.lines:
+                img = Image(data)
+                yield key(img), n, img
+        streams = [decorate(n, index) for n, index in enumerate(indexes)]
+        for _, n, img in heapq.merge(*streams):
+            yield img
 
     @property
     def _frompaths(self):
@@ -426,34 +785,186 @@ class Jexifs(object):
 
     @property
     def paths(self):
-        if self._paths: return self._paths
         path, ext = self.args.pathext.split(':')
-        for i,j,k in os.walk(path):
-            for f in k:
-                if not f.endswith(ext): continue
-                self._paths.append(os.path.join(i, f))
-        #if imgs won't be sorted make sure paths are...
-        if not self.args.sort: self._paths.sort()
-        return self._paths
-
-    def sort(self, attr):
-        if attr == 'exposure_time':
-            self._images.sort(key=lambda i: i[attr].value)
-        else:
-            self._images.sort(key=lambda i: i[attr].rvalue)
+        return self._walk(path, ext)
+
+    def _walk(self, path, ext):
+        #yield the paths in sorted order without walking the whole tree first.
+        #a directory's key ends with a separator to sort like its contents.
+        #unreadable directories are skipped like os.walk does.
+        try: names = os.listdir(path)
+        except OSError: return
+        entries = list()
+        for name in names:
+            p = os.path.join(path, name)
+            if os.path.isdir(p) and not os.path.islink(p):
+                entries.append((name + os.sep, p))
+            elif name.endswith(ext):
+                entries.append((name, p))
+        for key, p in sorted(entries):
+            if key.endswith(os.sep):
+                for subpath in self._walk(p, ext): yield subpath
+            else: yield p
+
+    @property
+    def sortkey(self):
+        attr = self.args.sort or 'datetime'
+        if attr == 'exposure_time': return lambda i: i[attr].value
+        else: return lambda i: i[attr].rvalue
+
+    @property
+    def file(self):
+        return self.args.output or sys.stdout
 
     def printlines(self):
-        if self.args.headline: print Image.fmt.translate(None, '{}')
+        if self.args.headline: print >>self.file, Image.lineformat.translate(None, '{}')
+        printed = 0
+        for img in self.images:
+            try:
+                if self.tests(img):
+                    img.fprint(self.file)
+                    printed += 1
+                    if printed == self.args.limit: raise PrintStop
+            except PrintStop: break
+
+    def printstats(self):
+        for img in self.images:
+            try:
+                if self.tests(img): self.aggregation(img)
+            except PrintStop: break
+        if self.args.headline: print >>self.file, self.aggregation.headline
+        for line in self.aggregation.lines: print >>self.file, line
+
+    def writedatabase(self):
+        database = self.args.write_database
+        written = 0
+        for img in self.images:
+            try:
+                if self.tests(img):
+                    database.insert(img)
+                    written += 1
+                    if written == self.args.limit: raise PrintStop
+            except PrintStop: break
+        database.commit()
+
+    def printqueries(self):
+        if self.aggregation or self.args.limit or self.args.output or self.args.headline:
+            raise ConfigurationError('Use arguments for aggregation, --limit, '
+                '--output and --headline within the queries')
+        queries = self.args.queries
+        for query in queries: query.printheadline()
         for img in self.images:
+            #the selection given next to --queries applies to all queries
             try:
-                if self.tests(img): img.fprint()
+                if not self.tests(img): continue
             except PrintStop: break
+            for query in queries:
+                if not query.done: query(img)
+            if all([query.done for query in queries]): break
+        for query in queries: query.printstats()
+
+
+queryparser = argparse.ArgumentParser(
+    prog='jexifs',
+    usage=USAGE,
+    add_help=False,
+    )
+queryparser.add_argument(
+    '-o',
+    '--output',
+    type=output,
+    default=None
+    )
+queryparser.add_argument(
+    '-H',
+    '--headline',
+    action='store_true',
+    )
+queryparser.add_argument(
+    '-l',
+    '--limit',
+    type=posint,
+    default=None
+    )
+queryparser.add_argument(
+    '-d',
+    '--dates',
+    action=timeparse.ParseDate,
+    nargs='+',
+    default=None
+    )
+queryparser.add_argument(
+    '-t',
+    '--times',
+    action=timeparse.ParseDaytime,
+    nargs='+',
+    default=None
+    )
+queryparser.add_argument(
+    '-D',
+    '--datetime',
+    action=timeparse.AppendDatetime,
+    nargs='+',
+    default=None
+    )
+queryparser.add_argument(
+    '-m',
+    '--model',
+    default=None
+    )
+queryparser.add_argument(
+    '-e',
+    '--exposure_time',
+    type=Fraction,
+    nargs='+',
+    default=None
+    )
+queryparser.add_argument(
+    '-p',
+    '--plus',
+    action=timeparse.ParseTimedelta,
+    nargs='+',
+    default=datetime.timedelta(),
+    dest='hours'    #makes ParseTimedelta taking the first value as hours.
+    )
+queryparser.add_argument(
+    '-a',
+    '--first-after',
+    action='store_true',
+    )
+queryparser.add_argument(
+    '-g',
+    '--group-by',
+    type=taglist,
+    default=None
+    )
+queryparser.add_argument(
+    '-c',
+    '--count',
+    action='store_true',
+    )
+queryparser.add_argument(
+    '--min',
+    action='store_true',
+    )
+queryparser.add_argument(
+    '--max',
+    action='store_true',
+    )
+queryparser.add_argument(
+    '-b',
+    '--buckets',
+    type=Fraction,
+    nargs='+',
+    default=None
+    )
 
 
 parser = argparse.ArgumentParser(
     prog='jexifs',
     usage=USAGE,
     conflict_handler='resolve',
+    parents=[queryparser],
     )
 parser.add_argument(
     'pathext',
@@ -471,9 +982,10 @@ parser.add_argument(
     action='store_true',
     )
 parser.add_argument(
-    '-H',
-    '--headline',
-    action='store_true',
+    '-q',
+    '--queries',
+    type=queries,
+    default=None
     )
 parser.add_argument(
     '-s',
@@ -496,55 +1008,21 @@ parser.add_argument(
     type=Index,
     const='-',
     nargs='?',
+    action='append',
     default=None
     )
 parser.add_argument(
-    '-d',
-    '--dates',
-    action=timeparse.ParseDate,
-    nargs='+',
-    default=None
-    )
-parser.add_argument(
-    '-t',
-    '--times',
-    action=timeparse.ParseDaytime,
-    nargs='+',
-    default=None
-    )
-parser.add_argument(
-    '-D',
-    '--datetime',
-    action=timeparse.AppendDatetime,
-    nargs='+',
-    default=None
-    )
-parser.add_argument(
-    '-m',
-    '--model',
+    '-I',
+    '--database',
+    type=Database.read,
     default=None
     )
 parser.add_argument(
-    '-e',
-    '--exposure_time',
-    type=Fraction,
-    nargs='+',
+    '-W',
+    '--write-database',
+    type=Database,
     default=None
     )
-parser.add_argument(
-    '-p',
-    '--plus',
-    action=timeparse.ParseTimedelta,
-    nargs='+',
-    default=datetime.timedelta(),
-    dest='hours'    #makes ParseTimedelta taking the first value as hours.
-    )
-parser.add_argument(
-    '-a',
-    '--first-after',
-    action='store_true',
-    )
-
 
 def main():
     try: args = parser.parse_args()
@@ -562,7 +1040,10 @@ def main():
     except (IOError, KeyboardInterrupt): pass
     except ConfigurationError as err: print err
     finally:
-        if jexifs.args.index: jexifs.args.index.file.close()
+        for index in jexifs.args.index or list(): index.file.close()
+        if jexifs.args.database: jexifs.args.database.close()
+        if jexifs.args.write_database: jexifs.args.write_database.close()
+        for file in OUTPUTS.values(): file.close()
 
 
 if __name__ == "__main__": main()
@@ -1,6 +1,9 @@
 import unittest
+import os
 import sys
 import shlex
+import tempfile
+import shutil
 from cStringIO import StringIO
 from timeparser import ENDIAN
 from jexifs import ConfigurationError
@@ -12,6 +15,7 @@ from jexifs import DateAttr
 from jexifs import TimeAttr
 from jexifs import Tests
 from jexifs import Jexifs
+from jexifs import OUTPUTS
 
 
 
@@ -21,6 +25,10 @@ class BaseTestCase(unittest.TestCase):
         sys.stdout = StringIO()
 
     def tearDown(self):
+        self.reset()
+        sys.stdout = self.held
+
+    def reset(self):
         Index._firstline = None
         Index.format = None
         Index.fmtlist = None
@@ -29,7 +37,8 @@ class BaseTestCase(unittest.TestCase):
         DatetimeAttr._fmt = None
         DateAttr._fmt = None
         TimeAttr._fmt = None
-        sys.stdout = self.held
+        for file in OUTPUTS.values(): file.close()
+        OUTPUTS.clear()
 
     def init(self, argstring):
         ENDIAN.set('little')
@@ -37,6 +46,26 @@ class BaseTestCase(unittest.TestCase):
         ENDIAN.set('big')
         self.jexifs = Jexifs(args)
 
+    def tempfile(self, *lines, **kwargs):
+        file = tempfile.NamedTemporaryFile(**kwargs)
+        file.write('\n'.join(lines) + '\n')
+        file.flush()
+        self.tempfiles = getattr(self, 'tempfiles', list()) + [file]
+        return file.name
+
+    @property
+    def output(self):
+        return sys.stdout.getvalue().splitlines()
+
+
+INDEX = (
+    'path date time exposure_time model',
+    'a/1.jpg 2013-07-09 08:30:00 1/250 Canon',
+    'a/2.jpg 2013-07-09 08:40:00 1/30 Nikon',
+    'a/3.jpg 2013-07-09 09:10:00 1/10 Canon',
+    'a/4.jpg 2013-07-10 07:00:00 1/250 Canon',
+    )
+
 
 class TestIndexFormat(BaseTestCase):
 
@@ -107,6 +136,280 @@ class TestIndexSorting(BaseTestCase):
         self.jexifs.printlines()
 
 
+class TestIndexHeadline(BaseTestCase):
+
+    def test_headline(self):
+        self.init(r'-i {0} -H -l 1 -f "name - date"'.format(self.tempfile(*INDEX)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, ['name - date', 'None - 2013-07-09'])
+
+    def test_headline_output(self):
+        out = self.tempfile()
+        self.init(r'-i {0} -H -l 1 -o {1}'.format(self.tempfile(*INDEX), out))
+        self.jexifs.printlines()
+        for file in OUTPUTS.values(): file.close()
+        self.assertEqual(self.output, list())
+        self.assertEqual(open(out).read().splitlines(), list(INDEX[:2]))
+
+
+class TestIndexLimit(BaseTestCase):
+
+    def test_limit(self):
+        self.init(r'-i {0} -l 3'.format(self.tempfile(*INDEX)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, list(INDEX[1:4]))
+
+    def test_limit_sort(self):
+        self.init(r'-i {0} -s exposure_time -l 2'.format(self.tempfile(*INDEX)))
+        self.jexifs.printlines()
+        self.assertEqual(len(self.jexifs.images), 2)
+        self.assertEqual(self.output, [INDEX[1], INDEX[4]])
+
+    def test_wrong_limit(self):
+        for limit in ('0', '-1', 'foo'):
+            self.assertRaises(
+                SystemExit,
+                self.init,
+                r'-i {0} -l {1}'.format(self.tempfile(*INDEX), limit)
+                )
+
+    def test_limit_sort_dates(self):
+        self.init(r'-i {0} -s datetime -l 1 -d 9.7.2013'.format(self.tempfile(*INDEX)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, [INDEX[1]])
+
+
+class TestIndexMerge(BaseTestCase):
+    SHARD = (
+        'name;date;time;model',
+        'b1.jpg;2013-07-09;08:35:00;Canon',
+        'b2.jpg;2013-07-09;09:00:00;Nikon',
+        )
+    NOHEADLINE = (
+        'c1.jpg 08:50:00 2013-07-09 1/60',
+        )
+
+    def test_merge(self):
+        self.init(r'-i {0} -i {1} -f "time model"'.format(
+            self.tempfile(*INDEX), self.tempfile(*self.SHARD)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, [
+            '08:30:00 Canon',
+            '08:35:00 Canon',
+            '08:40:00 Nikon',
+            '09:00:00 Nikon',
+            '09:10:00 Canon',
+            '07:00:00 Canon',
+            ])
+
+    def test_merge_F(self):
+        self.init(r'-F "name time date exposure_time" -i {0} -i {1} -f "time exposure_time"'.format(
+            self.tempfile(*INDEX), self.tempfile(*self.NOHEADLINE)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, [
+            '08:30:00 1/250',
+            '08:40:00 1/30',
+            '08:50:00 1/60',
+            '09:10:00 1/10',
+            '07:00:00 1/250',
+            ])
+
+    def test_merge_Da(self):
+        self.init(r'-i {0} -i {1} -D 9.7.2013 8:36 -a -f "time model"'.format(
+            self.tempfile(*INDEX), self.tempfile(*self.SHARD)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, ['08:40:00 Nikon'])
+        #the merge stopped after reading the image at 09:00
+        self.assertEqual(len(list(self.jexifs.images)), 2)
+
+    def test_merge_sort_limit(self):
+        self.init(r'-i {0} -i {1} -s time -l 2 -f "time model"'.format(
+            self.tempfile(*INDEX[:1] + INDEX[4:]), self.tempfile(*self.SHARD)))
+        self.jexifs.printlines()
+        self.assertEqual(self.output, ['07:00:00 Canon', '08:35:00 Canon'])
+
+
+class TestIndexQueries(BaseTestCase):
+
+    def init_queries(self, *lines, **kwargs):
+        self.init(r'-i {0} -q {1} {2}'.format(
+            self.tempfile(*INDEX), self.tempfile(*lines), kwargs.get('args', str())))
+
+    def test_queries(self):
+        self.init_queries(
+            r'# comment',
+            r'-d 9.7.2013',
+            r'-D 9.7.2013 8:30 -p 20min -a',
+            r'-g model -c',
+            )
+        self.assertEqual(len(self.jexifs.args.queries), 3)
+        self.jexifs.run()
+        self.assertEqual(self.output, [
+            INDEX[1], INDEX[1], INDEX[2], INDEX[3], 'Canon 3', 'Nikon 1'])
+
+    def test_queries_limit(self):
+        self.init_queries(r'-l 1', r'-l 2')
+        self.jexifs.run()
+        self.assertTrue(all([q.done for q in self.jexifs.args.queries]))
+        self.assertEqual(self.output, [INDEX[1], INDEX[1], INDEX[2]])
+
+    def test_queries_output(self):
+        out = self.tempfile()
+        self.init_queries(
+            r'-m Canon -o {0}'.format(out),
+            r'-m Nikon -o {0} -H'.format(out),
+            )
+        self.jexifs.run()
+        for file in OUTPUTS.values(): file.close()
+        self.assertEqual(open(out).read().splitlines(), list(INDEX))
+
+    def test_wrong_queries(self):
+        for line in (r'-m Canon -f "name model"', r'-s datetime', r'-i foo.tbl'):
+            self.assertRaises(SystemExit, self.init_queries, line)
+
+    def test_queries_selection(self):
+        self.init_queries(r'-d 9.7.2013', r'-g model -c', args=r'-m Canon')
+        self.jexifs.run()
+        self.assertEqual(self.output, [INDEX[1], INDEX[3], 'Canon 3'])
+
+    def test_wrong_queries_arguments(self):
+        for args in (r'-g model', r'-l 1', r'-H', r'-o ' + self.tempfile()):
+            self.init_queries(r'-d 9.7.2013', args=args)
+            self.assertRaises(ConfigurationError, self.jexifs.run)
+
+
+class TestDatabase(BaseTestCase):
+    #in order of datetime, but not of path
+    INDEX = INDEX[:1] + ('c/1.jpg 2013-07-09 08:20:00 1/500 Nikon',) + INDEX[1:]
+    FORMAT = r' -f "path date time exposure_time model"'
+
+    def setUp(self):
+        super(TestDatabase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.dbfile = os.path.join(self.dir, 'index.db')
+        self.index = self.tempfile(*self.INDEX)
+        self.select(r'-i {0} -W {1}'.format(self.index, self.dbfile))
+        self.jexifs.args.write_database.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(TestDatabase, self).tearDown()
+
+    def select(self, argstring):
+        self.reset()
+        sys.stdout = StringIO()
+        self.init(argstring)
+        self.jexifs.run()
+        return self.output
+
+    def assertSelection(self, argstring):
+        output = self.select(r'-I {0} {1}'.format(self.dbfile, argstring) + self.FORMAT)
+        self.assertTrue(output)
+        self.assertEqual(output, self.select(r'-i {0} {1}'.format(self.index, argstring) + self.FORMAT))
+        return output
+
+    def test_database(self):
+        output = self.assertSelection(r'-s path')
+        self.assertEqual(len(output), 5)
+
+    def test_database_Dp(self):
+        self.assertSelection(r'-D 9.7.2013 8:30 -p 20min -s path')
+
+    def test_database_e(self):
+        self.assertSelection(r'-e 1/100 1/20 -s path')
+
+    def test_database_dm(self):
+        self.assertSelection(r'-d 9.7.2013 -m Canon -s path')
+        self.select(r'-I {0} -d 9.7.2013 -m Canon'.format(self.dbfile))
+        self.assertEqual(self.jexifs.tests.tests, list())
+
+    def test_database_t(self):
+        self.assertSelection(r'-t 9:10 -s path')
+
+    def test_database_sort_limit(self):
+        output = self.assertSelection(r'-s exposure_time -l 2')
+        self.assertEqual(len(output), 2)
+
+    def test_database_Da(self):
+        output = self.assertSelection(r'-D 9.7.2013 8:15 -a')
+        self.assertEqual(output, [self.INDEX[1]])
+
+    def test_database_Da_sort(self):
+        self.init(r'-I {0} -D 9.7.2013 8:15 -a -s exposure_time'.format(self.dbfile))
+        self.assertRaises(ConfigurationError, self.jexifs.printlines)
+
+    def test_database_queries(self):
+        queries = self.tempfile(r'-d 9.7.2013', r'-D 9.7.2013 8:15 -a')
+        output = self.assertSelection(r'-q ' + queries)
+        self.assertEqual(output.count(self.INDEX[1]), 2)
+
+    def test_database_queries_sort(self):
+        queries = self.tempfile(r'-d 9.7.2013')
+        self.init(r'-I {0} -q {1} -s exposure_time'.format(self.dbfile, queries))
+        self.assertRaises(ConfigurationError, self.jexifs.run)
+
+    def test_write_database_limit(self):
+        dbfile = os.path.join(self.dir, 'limit.db')
+        self.select(r'-i {0} -W {1} -l 2'.format(self.index, dbfile))
+        self.jexifs.args.write_database.close()
+        output = self.select(r'-I {0} -s datetime'.format(dbfile) + self.FORMAT)
+        self.assertEqual(output, list(self.INDEX[1:3]))
+
+    def test_database_aggregation_limit(self):
+        self.assertSelection(r'-g model -l 2')
+
+    def test_missing_database(self):
+        dbfile = os.path.join(self.dir, 'typo.db')
+        self.assertRaises(SystemExit, self.init, r'-I ' + dbfile)
+        self.assertFalse(os.path.exists(dbfile))
+
+    def test_wrong_sort(self):
+        self.init(r'-I {0} -s foo'.format(self.dbfile))
+        self.assertRaises(ConfigurationError, self.jexifs.printlines)
+
+
+class TestFileWalk(BaseTestCase):
+
+    def setUp(self):
+        super(TestFileWalk, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        for path in ('a.jpg', 'a/b.jpg', 'a/b/x.jpg', 'a/b.x/y.jpg', 'a/z.jpg', 'a/n.txt'):
+            path = os.path.join(self.dir, path)
+            if not os.path.isdir(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(TestFileWalk, self).tearDown()
+
+    def test_walk_sorted(self):
+        self.init(r'{0}:jpg'.format(self.dir))
+        expected = list()
+        for i, j, k in os.walk(self.dir):
+            expected += [os.path.join(i, f) for f in k if f.endswith('jpg')]
+        self.assertEqual(list(self.jexifs.paths), sorted(expected))
+
+    def test_walk_nonexistent(self):
+        self.init(r'{0}:jpg'.format(os.path.join(self.dir, 'foo')))
+        self.assertEqual(list(self.jexifs.paths), list())
+
+    def test_walk_unreadable(self):
+        #chmod won't stop root from listing a directory, so fake the error
+        unreadable = os.path.join(self.dir, 'a', 'b')
+        listdir = os.listdir
+        def fake_listdir(path):
+            if path == unreadable: raise OSError(13, 'Permission denied', path)
+            return listdir(path)
+        os.listdir = fake_listdir
+        try:
+            self.init(r'{0}:jpg'.format(self.dir))
+            paths = list(self.jexifs.paths)
+        finally: os.listdir = listdir
+        self.assertIn(os.path.join(self.dir, 'a', 'z.jpg'), paths)
+        self.assertIn(os.path.join(self.dir, 'a', 'b.x', 'y.jpg'), paths)
+        self.assertNotIn(os.path.join(self.dir, 'a', 'b', 'x.jpg'), paths)
+
+
 class TestFileSelection(BaseTestCase):
 
     def test_t(self):
@@ -154,6 +457,54 @@ class TestFileSelection(BaseTestCase):
         self.jexifs.printlines()
 
 
+class TestIndexAggregation(BaseTestCase):
+
+    def test_count(self):
+        self.init(r'-i {0} -c'.format(self.tempfile(*INDEX)))
+        self.jexifs.run()
+        self.assertEqual(self.output, ['4'])
+
+    def test_count_without_parsing(self):
+        def parse(attr): raise AssertionError('datetime parsed')
+        held = DatetimeAttr.parse
+        DatetimeAttr.parse = parse
+        try:
+            self.init(r'-i {0} -g model -c'.format(self.tempfile(*INDEX)))
+            self.jexifs.run()
+        finally: DatetimeAttr.parse = held
+        self.assertEqual(self.output, ['Canon 3', 'Nikon 1'])
+
+    def test_group_by(self):
+        self.init(r'-i {0} -g model,date'.format(self.tempfile(*INDEX)))
+        self.jexifs.run()
+        self.assertEqual(self.output, [
+            'Canon 2013-07-09 2',
+            'Canon 2013-07-10 1',
+            'Nikon 2013-07-09 1',
+            ])
+
+    def test_group_by_minmax(self):
+        self.init(r'-i {0} -g date -c --min --max -H'.format(self.tempfile(*INDEX)))
+        self.jexifs.run()
+        self.assertEqual(self.output, [
+            'date count min max',
+            '2013-07-09 3 2013-07-09 08:30:00 2013-07-09 09:10:00',
+            '2013-07-10 1 2013-07-10 07:00:00 2013-07-10 07:00:00',
+            ])
+
+    def test_buckets(self):
+        self.init(r'-i {0} -b 1/60 1/15 1/8'.format(self.tempfile(*INDEX)))
+        self.jexifs.run()
+        self.assertEqual(self.output, ['0-1/60 2', '1/60-1/15 1', '1/15-1/8 1'])
+
+    def test_wrong_group_by(self):
+        self.assertRaises(
+            SystemExit,
+            self.init,
+            r'-i {0} -g model,foo'.format(self.tempfile(*INDEX))
+            )
+
+
 
 
 